@@ -6,46 +6,60 @@
 import asyncio
 import os
 import sys
-import time
 from datetime import datetime
-from playwright.async_api import async_playwright, Page, Browser
-import logging
-import requests
-from typing import Optional
-
-from common import BEIJING_TZ, get_logger, login_with_retry, run_with_retries, send_wxpush, send_wxpusher
+from playwright.async_api import (
+    BrowserContext,
+    Locator,
+    Page,
+    TimeoutError as PlaywrightTimeoutError,
+)
+from typing import Optional, Tuple
+
+from common import (
+    ACCOUNT_NAV_SELECTOR,
+    BEIJING_TZ,
+    browser_pool,
+    get_float_env,
+    get_http_session,
+    get_int_env,
+    get_logger,
+    install_uvloop,
+    login_with_retry,
+    NonRetriableError,
+    race_selectors,
+    reset_browser_profile,
+    run_with_retries,
+    send_wxpush,
+    send_wxpusher,
+    wait_for_optional_selector,
+    warm_up_ocr,
+)
 
 logger = get_logger(__name__)
 
-try:
-    import ddddocr
-
-    ocr = ddddocr.DdddOcr(show_ad=False)
-    logger.info("ddddocr 库已加载，将使用自动验证码识别")
-except ImportError:
-    ocr = None
-    logger.warning("ddddocr 库未安装，将无法自动识别验证码")
-except Exception as e:
-    ocr = None
-    logger.warning(f"ddddocr 初始化失败: {e}")
-
-
-def _get_int_env(var_name: str, default: int) -> int:
-    """读取整数环境变量，非法时使用默认值。"""
-    try:
-        return int(os.getenv(var_name, str(default)))
-    except Exception:
-        logger.warning(f"环境变量 {var_name} 非法，使用默认值 {default}")
-        return default
-
-
-def _get_float_env(var_name: str, default: float) -> float:
-    """读取浮点环境变量，非法时使用默认值。"""
-    try:
-        return float(os.getenv(var_name, str(default)))
-    except Exception:
-        logger.warning(f"环境变量 {var_name} 非法，使用默认值 {default}")
-        return default
+# 点击账号列表后，展开按钮或操作按钮出现即可继续
+EXPAND_OR_ACTION_SELECTOR = '.expand-icon, img[alt="展开"], .icon-image, .action-btn'
+
+# 提交打卡按钮候选，按优先级排列；合并选择器只用于一次等待任一候选出现
+SUBMIT_BUTTON_SELECTORS = (
+    'button.action-btn:has-text("提交打卡")',
+    'button:has-text("提交打卡")',
+    'button:has-text("打卡")',
+    'button:has-text("提交")',
+    ".action-btn",
+    'button[class*="action"]',
+    'button[class*="submit"]',
+)
+SUBMIT_BUTTON_SELECTOR = ", ".join(SUBMIT_BUTTON_SELECTORS)
+
+# 打卡成功提示候选，各自等待可见，任一出现即成功
+SUCCESS_TOAST_SELECTORS = (
+    'div.van-toast__text:has-text("成功")',
+    'div.van-toast__text:has-text("已提交")',
+    'div.van-toast__text:has-text("打卡成功")',
+    ".success",
+    ".toast",
+)
 
 
 class AutoCheckin:
@@ -56,8 +70,31 @@ class AutoCheckin:
         self.password = password
         self.headless = headless
         self.login_url = "https://qd.dxssxdk.com/lanhu_yonghudenglu"
-        self.browser: Optional[Browser] = None
+        self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
+        # 提交按钮的 (任一候选可见, 按优先级排列的各候选) Locator，按页面缓存复用
+        self._submit_locators: Optional[Tuple[Locator, Tuple[Locator, ...]]] = None
+
+    def _get_submit_locators(self) -> Tuple[Locator, Tuple[Locator, ...]]:
+        """提交按钮的 Locator，按页面缓存复用，重试时不再重建。"""
+        if self._submit_locators is None or self._submit_locators[0].page is not self.page:
+            self._submit_locators = (
+                self.page.locator(f"{SUBMIT_BUTTON_SELECTOR} >> visible=true").first,
+                tuple(self.page.locator(selector).first for selector in SUBMIT_BUTTON_SELECTORS),
+            )
+        return self._submit_locators
+
+    async def _find_submit_button(self) -> Optional[Locator]:
+        """等待任一提交按钮候选可见，再按优先级返回第一个可见的候选；超时返回 None。"""
+        any_visible, candidates = self._get_submit_locators()
+        try:
+            await any_visible.wait_for(timeout=10000)
+        except PlaywrightTimeoutError:
+            return None
+        for button in candidates:
+            if await button.is_visible():
+                return button
+        return None
 
     async def login_unlimited(self) -> bool:
         """登录系统：带总超时与重试。"""
@@ -67,7 +104,6 @@ class AutoCheckin:
             self.username,
             self.password,
             self.login_url,
-            ocr,
             logger,
             max_attempts=10,
             total_timeout=240,
@@ -77,18 +113,13 @@ class AutoCheckin:
         """执行打卡操作。"""
         try:
             logger.info("开始执行打卡操作...")
-            await asyncio.sleep(1)
             logger.info(f"当前页面 URL: {self.page.url}")
 
             # 第一步：点击"账号列表"导航
             try:
-                account_nav = await self.page.wait_for_selector(
-                    'span.nav-text:has-text("账号列表")', timeout=12000
-                )
-                if account_nav:
-                    await account_nav.click()
-                    logger.info("已点击账号列表导航")
-                    await asyncio.sleep(2)
+                await self.page.locator(ACCOUNT_NAV_SELECTOR).first.click(timeout=12000)
+                logger.info("已点击账号列表导航")
+                await wait_for_optional_selector(self.page, EXPAND_OR_ACTION_SELECTOR, timeout=5000)
             except Exception as e:
                 logger.warning(f"点击账号列表失败，尝试其他方式: {e}")
                 try:
@@ -96,112 +127,86 @@ class AutoCheckin:
                     if len(nav_items) >= 2:
                         await nav_items[1].click()
                         logger.info("通过索引点击账号列表导航")
-                        await asyncio.sleep(2)
+                        await wait_for_optional_selector(self.page, EXPAND_OR_ACTION_SELECTOR, timeout=5000)
                 except Exception as e2:
                     logger.error(f"无法点击账号列表: {e2}")
 
             # 第二步：点击"展开"按钮
             try:
-                expand_button = await self.page.wait_for_selector(
-                    '.expand-icon, img[alt="展开"], .icon-image', timeout=8000
+                await self.page.locator('.expand-icon, img[alt="展开"], .icon-image').first.click(timeout=8000)
+                logger.info("已点击展开按钮")
+                await wait_for_optional_selector(
+                    self.page, 'button.action-btn, button:has-text("提交打卡")', timeout=3000
                 )
-                if expand_button:
-                    await expand_button.click()
-                    logger.info("已点击展开按钮")
-                    await asyncio.sleep(1.5)
             except Exception:
                 logger.info("未找到展开按钮，可能已展开")
 
             # 第三步：点击"提交打卡"按钮
             logger.info("查找并点击提交打卡按钮...")
-            submit_button = None
-            selectors = [
-                'button.action-btn:has-text("提交打卡")',
-                'button:has-text("提交打卡")',
-                'button:has-text("打卡")',
-                'button:has-text("提交")',
-                ".action-btn",
-                'button[class*="action"]',
-                'button[class*="submit"]',
-            ]
-
-            for selector in selectors:
-                try:
-                    submit_button = await self.page.wait_for_selector(selector, timeout=3000)
-                    if submit_button:
-                        break
-                except Exception:
-                    continue
+            submit_clicked = False
+            try:
+                submit_button = await self._find_submit_button()
+                if submit_button:
+                    await submit_button.click(timeout=5000)
+                    submit_clicked = True
+            except Exception:
+                pass
 
-            if not submit_button:
+            if not submit_clicked:
+                submit_button = None
                 try:
-                    all_buttons = await self.page.query_selector_all("button")
-                    for btn in all_buttons:
-                        try:
-                            text = await btn.inner_text()
-                            if "打卡" in text or "提交" in text:
-                                submit_button = btn
-                                break
-                        except Exception:
-                            continue
+                    # 在页面内一次性扫描所有按钮文本，避免逐个 inner_text 往返
+                    handle = await self.page.evaluate_handle(
+                        """() => [...document.querySelectorAll('button')].find(
+                            (b) => b.innerText.includes('打卡') || b.innerText.includes('提交')
+                        ) || null"""
+                    )
+                    submit_button = handle.as_element()
                 except Exception as e:
                     logger.warning(f"遍历按钮时出错: {e}")
 
-            if not submit_button:
-                logger.error("未找到提交打卡按钮")
-                return False
+                if not submit_button:
+                    logger.error("未找到提交打卡按钮")
+                    return False
 
-            await submit_button.click()
+                await submit_button.click()
             logger.info("已点击提交打卡按钮")
 
-            # 等待成功提示
-            success_selectors = [
-                'div.van-toast__text:has-text("成功")',
-                'div.van-toast__text:has-text("已提交")',
-                'div.van-toast__text:has-text("打卡成功")',
-                ".success",
-                ".toast",
-            ]
-            for _ in range(30):
-                await asyncio.sleep(1)
-                for selector in success_selectors:
-                    try:
-                        elem = await self.page.query_selector(selector)
-                        if elem and await elem.is_visible():
-                            text = await elem.inner_text()
-                            logger.info(f"检测到成功提示: {text}")
-                            return True
-                    except Exception:
-                        continue
-
-            logger.error("未检测到打卡成功提示")
-            return False
+            # 等待成功提示：每个候选单独等待可见，避免合并选择器卡在第一个隐藏的匹配元素上
+            matched = await race_selectors(
+                self.page, {selector: selector for selector in SUCCESS_TOAST_SELECTORS}, timeout=30000
+            )
+            if matched is None:
+                logger.error("未检测到打卡成功提示")
+                return False
+
+            # 提示约 2 秒即消失：读取文字只为记录日志，读不到也不影响已确认的成功
+            try:
+                text = await self.page.locator(f"{matched} >> visible=true").first.inner_text(timeout=1000)
+                logger.info(f"检测到成功提示: {text}")
+            except Exception:
+                logger.info("检测到成功提示")
+            return True
 
         except Exception as e:
             logger.error(f"打卡操作失败: {e}")
             return False
 
     async def run(self) -> bool:
-        """运行自动打卡流程。"""
-        playwright = None
-        try:
-            playwright = await async_playwright().start()
-
-            launch_args = [
-                "--no-sandbox",
-                "--disable-setuid-sandbox",
-                "--disable-dev-shm-usage",  # 避免 /dev/shm 太小导致崩溃
-            ]
-
-            self.browser = await playwright.chromium.launch(headless=self.headless, args=launch_args)
-
-            context = await self.browser.new_context(
-                viewport={"width": 1280, "height": 720},
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            )
+        """运行自动打卡流程。首次调用启动浏览器，之后的重试复用它。
 
-            self.page = await context.new_page()
-            logger.info("浏览器启动成功")
+        浏览器只在出现异常时关闭重建，其余情况保持打开，由调用方 close()，以便与通知并行收尾。
+        """
+        try:
+            if self.context is None:
+                # 进程内共享的持久化浏览器：复用缓存与登录态，二次运行更快；OCR 预热与浏览器启动并行
+                self.context, _ = await asyncio.gather(
+                    browser_pool.acquire(headless=self.headless),
+                    warm_up_ocr(logger),
+                )
+                # 每个流程使用自己的页面，与同进程的其他流程互不干扰
+                self.page = await self.context.new_page()
+                logger.info("浏览器启动成功")
 
             if not await self.login_unlimited():
                 logger.error("登录失败，终止打卡流程")
@@ -214,21 +219,32 @@ class AutoCheckin:
             logger.info("自动打卡完成")
             return True
 
+        except NonRetriableError:
+            # 重试无意义，交给 run_with_retries 立即停止；浏览器由调用方关闭
+            raise
+
         except Exception as e:
             logger.error(f"自动打卡流程出错: {e}")
+            # 页面状态未知，释放后下次重试重新获取（浏览器无其他持有者时一并重启）
+            await self.close()
             return False
 
-        finally:
+    async def close(self) -> None:
+        """关闭本流程的页面并释放共享浏览器（最后一个使用者负责关闭），可重复调用。"""
+        if not self.context:
+            return
+        try:
             try:
                 if self.page:
-                    await asyncio.sleep(1)
-                if self.browser:
-                    await self.browser.close()
-                    logger.info("浏览器已关闭")
-                if playwright:
-                    await playwright.stop()
-            except Exception as e:
-                logger.warning(f"关闭浏览器时出错: {e}")
+                    await self.page.close()
+            finally:
+                await browser_pool.release()
+            logger.info("浏览器已释放")
+        except Exception as e:
+            logger.warning(f"关闭浏览器时出错: {e}")
+        finally:
+            self.context = None
+            self.page = None
 
 
 async def main():
@@ -239,13 +255,19 @@ async def main():
     wxpusher_uid = os.getenv("WXPUSHER_UID", "")
     wxpush_enabled = bool(os.getenv("WXPUSH_URL") and os.getenv("WXPUSH_TOKEN"))
 
+    args = sys.argv[1:]
+    if "--cold" in args:
+        # 登录态异常时清空持久化用户目录，强制重新登录
+        args.remove("--cold")
+        reset_browser_profile(logger)
+
     if not username or not password:
-        if len(sys.argv) >= 3:
-            username = sys.argv[1]
-            password = sys.argv[2]
+        if len(args) >= 2:
+            username = args[0]
+            password = args[1]
         else:
             logger.error("请设置环境变量 CHECKIN_USERNAME 和 CHECKIN_PASSWORD，或通过命令行参数提供")
-            logger.error("用法: python auto_checkin.py <用户名> <密码>")
+            logger.error("用法: python auto_checkin.py [--cold] <用户名> <密码>")
             return
 
     now_beijing = datetime.now(BEIJING_TZ)
@@ -261,11 +283,15 @@ async def main():
         notify_methods.append("WxPusher")
     if notify_methods:
         logger.info(f"通知: 已配置 {', '.join(notify_methods)}")
+    http_session = get_http_session()
+
     async def send_notifications(title: str, message: str):
+        tasks = []
         if wxpush_enabled:
-            await send_wxpush(title, message, logger, requests)
+            tasks.append(send_wxpush(title, message, logger, http_session))
         if wxpusher_app_token and wxpusher_uid:
-            await send_wxpusher(wxpusher_app_token, wxpusher_uid, title, message, logger, requests)
+            tasks.append(send_wxpusher(wxpusher_app_token, wxpusher_uid, title, message, logger, http_session))
+        await asyncio.gather(*tasks)
 
     if 6 <= current_hour < 12:
         checkin_type = "上班"
@@ -277,24 +303,20 @@ async def main():
         logger.warning(f"当前时间 {current_hour}:00 不在打卡时间段内，跳过打卡")
         return
 
-    max_retry_attempts = _get_int_env("CHECKIN_RETRY_ATTEMPTS", 3)
-    retry_delay_seconds = _get_int_env("CHECKIN_RETRY_DELAY", 90)
-    retry_backoff = _get_float_env("CHECKIN_RETRY_BACKOFF", 1.5)
+    max_retry_attempts = get_int_env("CHECKIN_RETRY_ATTEMPTS", 3, logger)
+    retry_delay_seconds = get_int_env("CHECKIN_RETRY_DELAY", 90, logger)
+    retry_backoff = get_float_env("CHECKIN_RETRY_BACKOFF", 1.5, logger)
 
     logger.info(
         f"打卡重试配置: 最多 {max_retry_attempts} 次，初始间隔 {retry_delay_seconds}s，回退系数 {retry_backoff}"
     )
 
-    checkin: Optional[AutoCheckin] = None
-
-    async def attempt_checkin():
-        nonlocal checkin
-        checkin = AutoCheckin(username=username, password=password, headless=True)
-        return await checkin.run()
+    # 所有重试共用一个实例与浏览器，避免每次重新启动 Chromium
+    checkin = AutoCheckin(username=username, password=password, headless=True)
 
     success, used_attempts = await run_with_retries(
         action_name=f"{checkin_type}打卡",
-        task_coro_factory=attempt_checkin,
+        task_coro_factory=checkin.run,
         logger=logger,
         max_attempts=max_retry_attempts,
         delay_seconds=retry_delay_seconds,
@@ -316,7 +338,6 @@ async def main():
 状态: 打卡成功"""
 
         logger.info(f"========== {checkin_type}打卡成功 ==========")
-        await send_notifications(title, message)
     else:
         title = f"{checkin_type}打卡失败"
         message = f"""{checkin_type}打卡失败，请人工检查。
@@ -324,12 +345,18 @@ async def main():
 日期: {date_str}
 时间: {time_str} (北京时间)
 用户: {username}
-重试: 已尝试 {max_retry_attempts} 次（全部失败）
+重试: 已尝试 {used_attempts} 次（全部失败，最多 {max_retry_attempts} 次）
 状态: 打卡失败"""
 
         logger.error(f"========== {checkin_type}打卡失败 ==========")
-        await send_notifications(title, message)
+
+    # 通知请求与浏览器关闭并行，缩短收尾耗时
+    await asyncio.gather(
+        checkin.close(),
+        send_notifications(title, message),
+    )
 
 
 if __name__ == "__main__":
+    install_uvloop(logger)
     asyncio.run(main())
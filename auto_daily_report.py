@@ -9,44 +9,89 @@ import os
 import sys
 import time
 from datetime import datetime
-from playwright.async_api import async_playwright, Page, Browser
-import logging
-import requests
-from typing import Optional
-
-from common import BEIJING_TZ, get_logger, login_with_retry, run_with_retries, send_wxpush, send_wxpusher
+from playwright.async_api import (
+    BrowserContext,
+    Locator,
+    Page,
+    TimeoutError as PlaywrightTimeoutError,
+)
+from typing import Dict, Optional
+
+from common import (
+    ACCOUNT_NAV_SELECTOR,
+    BEIJING_TZ,
+    browser_pool,
+    get_float_env,
+    get_http_session,
+    get_int_env,
+    get_logger,
+    install_uvloop,
+    login_with_retry,
+    NonRetriableError,
+    race_selectors,
+    record_api_calls,
+    reset_browser_profile,
+    run_with_retries,
+    save_api_calls,
+    send_wxpush,
+    send_wxpusher,
+    wait_for_optional_selector,
+    warm_up_ocr,
+)
 
 logger = get_logger(__name__)
 
-try:
-    import ddddocr
-
-    ocr = ddddocr.DdddOcr(show_ad=False)
-    logger.info("ddddocr 库已加载，将使用自动验证码识别")
-except ImportError:
-    ocr = None
-    logger.warning("ddddocr 库未安装，将无法自动识别验证码")
-except Exception as e:
-    ocr = None
-    logger.warning(f"ddddocr 初始化失败: {e}")
-
-
-def _get_int_env(var_name: str, default: int) -> int:
-    """读取整数环境变量，非法时使用默认值。"""
-    try:
-        return int(os.getenv(var_name, str(default)))
-    except Exception:
-        logger.warning(f"环境变量 {var_name} 非法，使用默认值 {default}")
-        return default
-
-
-def _get_float_env(var_name: str, default: float) -> float:
-    """读取浮点环境变量，非法时使用默认值。"""
-    try:
-        return float(os.getenv(var_name, str(default)))
-    except Exception:
-        logger.warning(f"环境变量 {var_name} 非法，使用默认值 {default}")
-        return default
+# 可见的 AI 生成结果提示：成功返回 "ok"，失败返回 "fail"，否则继续轮询
+AI_OUTCOME_JS = """() => {
+    for (const toast of document.querySelectorAll('div.van-toast__text')) {
+        if (!toast.getClientRects().length) continue;
+        if (toast.innerText.includes('AI生成完成')) return 'ok';
+        if (toast.innerText.includes('AI生成失败')) return 'fail';
+    }
+    return false;
+}"""
+
+# 报告内容已由 AI 填入文本框
+CONTENT_READY_JS = """(selector) => {
+    const textarea = document.querySelector(selector);
+    return !!textarea && textarea.value.length > 10;
+}"""
+
+# 最近记录面板状态：最新一条的日期与刷新按钮是否存在，一次往返读取；
+# waitForDate 为真且日期尚未渲染或仍等于 previous（刷新前的旧日期）时返回 false，供 wait_for_function 继续轮询
+REPORT_STATE_JS = """([dateSelector, refreshSelector, waitForDate, previous]) => {
+    const date = document.querySelector(dateSelector);
+    const text = !!date && date.getClientRects().length > 0 ? date.innerText.trim() : null;
+    if (waitForDate && (text === null || text === previous)) return false;
+    return {
+        date: text,
+        refresh: !!document.querySelector(refreshSelector),
+    };
+}"""
+
+# 页面选择器
+EXPAND_ICON_SELECTOR = "div.expand-icon"
+REPORT_BUTTON_SELECTORS = ('button.action-btn:has-text("生成报告")', 'button:has-text("生成报告")')
+REPORT_BUTTON_SELECTOR = ", ".join(REPORT_BUTTON_SELECTORS)
+TAB_ITEM_SELECTOR = "div.tab-item"
+RECENT_TAB_SELECTOR = 'div.tab-item:has-text("最近记录")'
+GENERATE_TAB_SELECTOR = 'div.tab-item:has-text("生成报告")'
+REFRESH_BUTTON_SELECTOR = "button.refresh-btn"
+REPORT_DATE_SELECTOR = "span.report-date"
+AI_BUTTON_SELECTOR = "button.ai-generate-btn"
+CONTENT_TEXTAREA_SELECTOR = "textarea.content-textarea"
+SUBMIT_REPORT_BUTTON_SELECTOR = "button.submit-btn"
+SUBMIT_OK_TOAST_SELECTOR = 'div.van-toast__text:has-text("报告提交成功")'
+FAIL_TOAST_SELECTOR = 'div.van-toast__text:has-text("失败")'
+AI_FAIL_TOAST_SELECTOR = 'div.van-toast__text:has-text("AI生成失败")'
+
+
+# 最近记录列表接口的 URL 特征，可用 API_RECORD_FILE 录制接口后核对
+REPORT_LIST_API_KEYWORD = "report"
+
+
+def _is_report_list_response(response) -> bool:
+    return response.request.resource_type in ("xhr", "fetch") and REPORT_LIST_API_KEYWORD in response.url.lower()
 
 
 class AutoDailyReport:
@@ -57,9 +102,19 @@ class AutoDailyReport:
         self.password = password
         self.headless = headless
         self.login_url = "https://qd.dxssxdk.com/lanhu_yonghudenglu"
-        self.browser: Optional[Browser] = None
+        self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
         self.report_already_submitted = False
+        self._today = ""
+        self._locators: Dict[str, Locator] = {}
+
+    def _locator(self, selector: str) -> Locator:
+        """选择器对应的首个元素 Locator，按页面缓存复用。"""
+        locator = self._locators.get(selector)
+        if locator is None or locator.page is not self.page:
+            locator = self.page.locator(selector).first
+            self._locators[selector] = locator
+        return locator
 
     async def login_unlimited(self) -> bool:
         """登录系统：带总超时与重试。"""
@@ -69,50 +124,59 @@ class AutoDailyReport:
             self.username,
             self.password,
             self.login_url,
-            ocr,
             logger,
             max_attempts=10,
             total_timeout=240,
         )
 
+    async def _report_state(self, timeout: int, previous: Optional[str] = None) -> dict:
+        """等待最近记录的日期出现且不同于 previous，返回 {"date": 日期或 None, "refresh": 是否有刷新按钮}。
+
+        超时后不再等待，直接返回当前状态。
+        """
+        arg = [REPORT_DATE_SELECTOR, REFRESH_BUTTON_SELECTOR, True, previous]
+        try:
+            handle = await self.page.wait_for_function(REPORT_STATE_JS, arg=arg, timeout=timeout, polling=100)
+            return await handle.json_value()
+        except PlaywrightTimeoutError:
+            arg[2] = False
+            return await self.page.evaluate(REPORT_STATE_JS, arg)
+
     async def check_today_report_submitted(self) -> bool:
         """检查今天的日报是否已提交。"""
         try:
             logger.info("检查今天的日报是否已提交...")
 
             try:
-                recent_tab = await self.page.wait_for_selector(
-                    'div.tab-item:has-text("最近记录")', timeout=15000
-                )
-                if recent_tab:
-                    await recent_tab.click()
-                    await asyncio.sleep(1.5)
+                await self._locator(RECENT_TAB_SELECTOR).click(timeout=15000)
             except Exception:
                 pass
 
-            try:
-                refresh_button = await self.page.wait_for_selector(
-                    "button.refresh-btn", timeout=8000
-                )
-                if refresh_button:
-                    await refresh_button.click()
-                    await asyncio.sleep(1.5)
-            except Exception:
-                pass
+            today = self._today or datetime.now(BEIJING_TZ).strftime("%Y-%m-%d")
 
-            today = datetime.now().strftime("%Y-%m-%d")
+            # 已加载的最新记录就是今天时无需再点刷新；同一次读取顺带得知刷新按钮是否存在
+            state = await self._report_state(timeout=3000)
+            if state["date"] == today:
+                logger.info("今日日报已完成")
+                return True
 
-            try:
-                report_date_element = await self.page.wait_for_selector(
-                    "span.report-date", timeout=8000
-                )
-                if report_date_element:
-                    report_date = await report_date_element.inner_text()
-                    if report_date == today:
-                        logger.info("今日日报已完成")
-                        return True
-            except Exception:
-                pass
+            if not state["refresh"]:
+                # 没有刷新按钮，只能等最新记录渲染出来
+                state = await self._report_state(timeout=8000)
+            else:
+                # 等最近记录接口返回，再等日期从刷新前的旧值变化；日期不变（今天确实未提交）时限时放弃，
+                # 避免读到刷新前的旧日期而误判为未提交、重复提交日报
+                response_seen = True
+                try:
+                    async with self.page.expect_response(_is_report_list_response, timeout=5000):
+                        await self._locator(REFRESH_BUTTON_SELECTOR).click()
+                except PlaywrightTimeoutError:
+                    response_seen = False
+                state = await self._report_state(timeout=2000 if response_seen else 5000, previous=state["date"])
+
+            if state["date"] == today:
+                logger.info("今日日报已完成")
+                return True
 
             logger.info("今日日报未完成")
             return False
@@ -121,6 +185,26 @@ class AutoDailyReport:
             logger.error(f"检查日报状态时出错: {e}")
             return False
 
+    async def _wait_ai_outcome(self, timeout_seconds: int) -> str:
+        """在页面内轮询 AI 生成结果提示，返回 "ok" / "fail" / "timeout"。"""
+        try:
+            handle = await self.page.wait_for_function(
+                AI_OUTCOME_JS, timeout=timeout_seconds * 1000, polling=100
+            )
+            return await handle.json_value()
+        except PlaywrightTimeoutError:
+            return "timeout"
+
+    async def _wait_content_ready(self, timeout: int) -> bool:
+        """等待 AI 内容写入文本框，超时返回 False。"""
+        try:
+            await self.page.wait_for_function(
+                CONTENT_READY_JS, arg=CONTENT_TEXTAREA_SELECTOR, timeout=timeout, polling=100
+            )
+            return True
+        except PlaywrightTimeoutError:
+            return False
+
     async def click_ai_generate_with_retry(
         self, max_retries: int = 5, wait_per_attempt: int = 30, total_timeout: int = 180
     ) -> bool:
@@ -133,45 +217,25 @@ class AutoDailyReport:
 
             logger.info(f"AI 生成报告尝试 {attempt}/{max_retries}")
             try:
-                ai_button = await self.page.wait_for_selector(
-                    "button.ai-generate-btn", timeout=15000
-                )
-                if ai_button:
-                    await ai_button.click()
-                    logger.info("已点击 AI 生成报告按钮")
-                else:
-                    continue
-
-                attempt_deadline = time.monotonic() + wait_per_attempt
-                while time.monotonic() < attempt_deadline:
-                    await asyncio.sleep(1)
-
-                    try:
-                        complete_toast = await self.page.query_selector(
-                            'div.van-toast__text:has-text("AI生成完成")'
-                        )
-                        if complete_toast and await complete_toast.is_visible():
-                            logger.info("AI 生成完成")
-                            await asyncio.sleep(1)
-                            return True
-                    except Exception:
-                        pass
-
-                    try:
-                        fail_toast = await self.page.query_selector(
-                            'div.van-toast__text:has-text("AI生成失败")'
-                        )
-                        if fail_toast and await fail_toast.is_visible():
-                            logger.warning("AI 生成失败，准备重试...")
-                            await asyncio.sleep(2)
-                            break
-                    except Exception:
-                        pass
+                await self._locator(AI_BUTTON_SELECTOR).click(timeout=15000)
+                logger.info("已点击 AI 生成报告按钮")
+
+                outcome = await self._wait_ai_outcome(wait_per_attempt)
+                if outcome == "ok":
+                    logger.info("AI 生成完成")
+                    await self._wait_content_ready(timeout=3000)
+                    return True
+                if outcome == "fail":
+                    logger.warning("AI 生成失败，准备重试...")
+                    # 旧的失败提示消失后再重试，否则下一轮会立即读到它
+                    await wait_for_optional_selector(
+                        self.page, AI_FAIL_TOAST_SELECTOR, timeout=5000, state="hidden"
+                    )
 
                 # 如果没有明确成功，再检查内容是否生成
                 try:
-                    textarea = await self.page.query_selector("textarea.content-textarea")
-                    if textarea:
+                    textarea = self._locator(CONTENT_TEXTAREA_SELECTOR)
+                    if await textarea.count():
                         content = await textarea.input_value()
                         if content and len(content) > 10:
                             logger.info("AI 生成完成（通过内容校验）")
@@ -181,7 +245,6 @@ class AutoDailyReport:
 
             except Exception as e:
                 logger.error(f"AI 生成报告出错: {e}")
-                await asyncio.sleep(2)
 
         return False
 
@@ -189,47 +252,48 @@ class AutoDailyReport:
         """提交日报：确保成功 toast，否则视为失败。"""
         try:
             logger.info("开始提交日报...")
-            await asyncio.sleep(1.5)
 
-            # 第一步：点击"账号列表"导航
+            # 第一步：点击"账号列表"导航，并同时等待展开按钮和生成报告按钮，谁先出现就按谁继续
+            first_visible = None
             try:
-                account_nav = await self.page.wait_for_selector(
-                    'span.nav-text:has-text("账号列表")', timeout=15000
+                await self._locator(ACCOUNT_NAV_SELECTOR).click(timeout=15000)
+                logger.info("已点击账号列表导航")
+                first_visible = await race_selectors(
+                    self.page,
+                    {
+                        "expand": EXPAND_ICON_SELECTOR,
+                        "report": REPORT_BUTTON_SELECTOR,
+                    },
+                    timeout=10000,
                 )
-                if account_nav:
-                    await account_nav.click()
-                    logger.info("已点击账号列表导航")
-                    await asyncio.sleep(2)
             except Exception as e:
                 logger.warning(f"点击账号列表失败: {e}")
 
-            # 第二步：点击"展开"按钮
-            try:
-                expand_button = await self.page.wait_for_selector(
-                    "div.expand-icon", timeout=8000
-                )
-                if expand_button:
-                    await expand_button.click()
+            # 第二步：点击"展开"按钮（生成报告按钮已可见时跳过）
+            if first_visible != "report":
+                try:
+                    await self._locator(EXPAND_ICON_SELECTOR).click(timeout=8000)
                     logger.info("已点击展开按钮")
-                    await asyncio.sleep(1)
-            except Exception:
-                pass
+                    await wait_for_optional_selector(self.page, REPORT_BUTTON_SELECTOR, timeout=5000)
+                except Exception:
+                    pass
 
             # 第三步：点击"生成报告"按钮
             try:
                 report_button = None
-                for selector in ['button.action-btn:has-text("生成报告")', 'button:has-text("生成报告")']:
+                for selector in REPORT_BUTTON_SELECTORS:
+                    candidate = self._locator(selector)
                     try:
-                        report_button = await self.page.wait_for_selector(selector, timeout=8000)
-                        if report_button:
-                            break
+                        await candidate.wait_for(timeout=8000)
                     except Exception:
                         continue
+                    report_button = candidate
+                    break
 
                 if report_button:
                     await report_button.click()
                     logger.info("已点击生成报告按钮")
-                    await asyncio.sleep(2)
+                    await wait_for_optional_selector(self.page, TAB_ITEM_SELECTOR, timeout=10000)
                 else:
                     logger.error("未找到生成报告按钮")
                     return False
@@ -243,15 +307,10 @@ class AutoDailyReport:
                 return True
 
             # 第五步：点击"生成报告"标签
-            try:
-                generate_tab = await self.page.wait_for_selector(
-                    'div.tab-item:has-text("生成报告")', timeout=8000
-                )
-                if generate_tab:
-                    await generate_tab.click()
-                    await asyncio.sleep(1)
-            except Exception:
-                pass
+            generate_tab = self._locator(GENERATE_TAB_SELECTOR)
+            if await generate_tab.count():
+                await generate_tab.click()
+                await wait_for_optional_selector(self.page, AI_BUTTON_SELECTOR, timeout=5000)
 
             # 第六步：点击"AI生成报告"按钮
             if not await self.click_ai_generate_with_retry():
@@ -260,25 +319,26 @@ class AutoDailyReport:
 
             # 第七步：点击"提交报告"按钮
             try:
-                submit_button = await self.page.wait_for_selector("button.submit-btn", timeout=15000)
-                if submit_button:
-                    await submit_button.click()
-                    logger.info("已点击提交报告按钮")
-
-                    for _ in range(30):
-                        await asyncio.sleep(1)
-                        try:
-                            success_toast = await self.page.query_selector(
-                                'div.van-toast__text:has-text("报告提交成功")'
-                            )
-                            if success_toast and await success_toast.is_visible():
-                                logger.info("报告提交成功")
-                                return True
-                        except Exception:
-                            pass
-
-                    logger.error("未检测到提交成功提示，视为失败")
+                await self._locator(SUBMIT_REPORT_BUTTON_SELECTOR).click(timeout=15000)
+                logger.info("已点击提交报告按钮")
+
+                outcome = await race_selectors(
+                    self.page,
+                    {
+                        "ok": SUBMIT_OK_TOAST_SELECTOR,
+                        "fail": FAIL_TOAST_SELECTOR,
+                    },
+                    timeout=10000,
+                )
+                if outcome == "ok":
+                    logger.info("报告提交成功")
+                    return True
+                if outcome == "fail":
+                    logger.error("提交报告失败提示出现")
                     return False
+
+                logger.error("未检测到提交成功提示，视为失败")
+                return False
             except Exception as e:
                 logger.error(f"点击提交报告按钮失败: {e}")
                 return False
@@ -287,53 +347,82 @@ class AutoDailyReport:
             logger.error(f"提交日报失败: {e}")
             return False
 
-    async def run(self) -> bool:
-        """运行自动日报流程。"""
-        playwright = None
-        try:
-            playwright = await async_playwright().start()
+    async def run_in_context(self, context: BrowserContext) -> bool:
+        """在给定的浏览器上下文中执行登录与日报提交；上下文由调用方创建和关闭。
 
-            launch_args = [
-                "--no-sandbox",
-                "--disable-setuid-sandbox",
-                "--disable-dev-shm-usage",  # 避免 /dev/shm 太小导致崩溃
-            ]
+        多个账号可共用一个浏览器进程，每个账号一个 context 并发调用本方法；
+        非持久化的临时 context 可先调用 common.block_heavy_resources(context) 拦截重资源（拦截会使 HTTP 缓存失效）。
+        """
+        # 站点按北京时间记日期；容器 TZ 通常为 UTC，必须显式换算
+        self._today = datetime.now(BEIJING_TZ).strftime("%Y-%m-%d")
+        if self.page is None or self.page.context is not context:
+            # 使用自己的页面，与共用该 context 的其他流程互不干扰；重试时复用
+            self.page = await context.new_page()
 
-            self.browser = await playwright.chromium.launch(headless=self.headless, args=launch_args)
+        if not await self.login_unlimited():
+            logger.error("登录失败，终止日报流程")
+            return False
 
-            context = await self.browser.new_context(
-                viewport={"width": 1280, "height": 720},
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            )
+        # 可选：记录提交流程中的 XHR 接口，便于后续改为直接调用接口
+        record_path = os.getenv("API_RECORD_FILE", "")
+        recording = record_api_calls(self.page) if record_path else None
+        try:
+            submitted = await self.submit_daily_report()
+        finally:
+            if recording is not None:
+                # 先停止记录，页面在后续重试中复用，监听器不能留在上面
+                api_calls, stop_recording = recording
+                stop_recording()
+                save_api_calls(api_calls, record_path, logger)
+
+        if not submitted:
+            logger.error("日报提交失败")
+            return False
 
-            self.page = await context.new_page()
-            logger.info("浏览器启动成功")
+        logger.info("自动日报完成")
+        return True
 
-            if not await self.login_unlimited():
-                logger.error("登录失败，终止日报流程")
-                return False
+    async def run(self) -> bool:
+        """运行自动日报流程：首次调用从进程内共享的浏览器池获取持久化浏览器，之后的重试复用它。
 
-            if not await self.submit_daily_report():
-                logger.error("日报提交失败")
-                return False
+        浏览器只在出现异常时关闭重建，其余情况保持打开，由调用方 close()，以便与通知并行收尾。
+        """
+        try:
+            if self.context is None:
+                # 持久化用户目录：登录态未过期时 login_with_retry 直接跳过验证码登录
+                self.context, _ = await asyncio.gather(
+                    browser_pool.acquire(headless=self.headless),
+                    warm_up_ocr(logger),
+                )
+                logger.info("浏览器启动成功")
 
-            logger.info("自动日报完成")
-            return True
+            return await self.run_in_context(self.context)
+
+        except NonRetriableError:
+            # 重试无意义，交给 run_with_retries 立即停止；浏览器由调用方关闭
+            raise
 
         except Exception as e:
             logger.error(f"自动日报流程出错: {e}")
+            # 页面状态未知，释放后下次重试重新获取（浏览器无其他持有者时一并重启）
+            await self.close()
             return False
 
-        finally:
+    async def close(self) -> None:
+        """关闭本流程的页面并释放共享浏览器（最后一个使用者负责关闭），可重复调用。"""
+        if not self.context:
+            return
+        try:
             try:
                 if self.page:
-                    await asyncio.sleep(1)
-                if self.browser:
-                    await self.browser.close()
-                if playwright:
-                    await playwright.stop()
-            except Exception:
-                pass
+                    await self.page.close()
+            finally:
+                await browser_pool.release()
+        except Exception:
+            pass
+        finally:
+            self.context = None
+            self.page = None
 
 
 async def main():
@@ -344,10 +433,16 @@ async def main():
     wxpusher_uid = os.getenv("WXPUSHER_UID", "")
     wxpush_enabled = bool(os.getenv("WXPUSH_URL") and os.getenv("WXPUSH_TOKEN"))
 
+    args = sys.argv[1:]
+    if "--cold" in args:
+        # 登录态异常时清空持久化用户目录，强制重新登录
+        args.remove("--cold")
+        reset_browser_profile(logger)
+
     if not username or not password:
-        if len(sys.argv) >= 3:
-            username = sys.argv[1]
-            password = sys.argv[2]
+        if len(args) >= 2:
+            username = args[0]
+            password = args[1]
         else:
             logger.error("请设置环境变量 CHECKIN_USERNAME 和 CHECKIN_PASSWORD")
             return
@@ -358,9 +453,9 @@ async def main():
     logger.info(f"时间: {now_beijing.strftime('%Y-%m-%d %H:%M:%S')} (北京时间)")
     logger.info(f"用户: {username}")
 
-    max_retry_attempts = _get_int_env("DAILY_REPORT_RETRY_ATTEMPTS", 3)
-    retry_delay_seconds = _get_int_env("DAILY_REPORT_RETRY_DELAY", 90)
-    retry_backoff = _get_float_env("DAILY_REPORT_RETRY_BACKOFF", 1.5)
+    max_retry_attempts = get_int_env("DAILY_REPORT_RETRY_ATTEMPTS", 3, logger)
+    retry_delay_seconds = get_int_env("DAILY_REPORT_RETRY_DELAY", 90, logger)
+    retry_backoff = get_float_env("DAILY_REPORT_RETRY_BACKOFF", 1.5, logger)
 
     notify_methods = []
     if wxpush_enabled:
@@ -370,26 +465,26 @@ async def main():
     if notify_methods:
         logger.info(f"通知: 已配置 {', '.join(notify_methods)}")
 
+    http_session = get_http_session()
+
     async def send_notifications(title: str, message: str):
+        tasks = []
         if wxpush_enabled:
-            await send_wxpush(title, message, logger, requests)
+            tasks.append(send_wxpush(title, message, logger, http_session))
         if wxpusher_app_token and wxpusher_uid:
-            await send_wxpusher(wxpusher_app_token, wxpusher_uid, title, message, logger, requests)
+            tasks.append(send_wxpusher(wxpusher_app_token, wxpusher_uid, title, message, logger, http_session))
+        await asyncio.gather(*tasks)
 
     logger.info(
         f"日报重试配置: 最多 {max_retry_attempts} 次，初始间隔 {retry_delay_seconds}s，回退系数 {retry_backoff}"
     )
 
-    report: Optional[AutoDailyReport] = None
-
-    async def attempt_daily_report():
-        nonlocal report
-        report = AutoDailyReport(username=username, password=password, headless=True)
-        return await report.run()
+    # 所有重试共用一个实例与浏览器，避免每次重新启动 Chromium
+    report = AutoDailyReport(username=username, password=password, headless=True)
 
     success, used_attempts = await run_with_retries(
         action_name="日报提交",
-        task_coro_factory=attempt_daily_report,
+        task_coro_factory=report.run,
         logger=logger,
         max_attempts=max_retry_attempts,
         delay_seconds=retry_delay_seconds,
@@ -421,7 +516,6 @@ async def main():
 状态: 日报已成功提交"""
 
         logger.info("========== 日报完成 ==========")
-        await send_notifications(title, message)
     else:
         title = "日报未完成"
         message = f"""日报提交失败。
@@ -429,12 +523,18 @@ async def main():
 日期: {date_str}
 时间: {time_str} (北京时间)
 用户: {username}
-重试: 已尝试 {max_retry_attempts} 次（全部失败）
+重试: 已尝试 {used_attempts} 次（全部失败，最多 {max_retry_attempts} 次）
 状态: 日报提交失败"""
 
         logger.error("========== 日报未完成 ==========")
-        await send_notifications(title, message)
+
+    # 通知请求与浏览器关闭并行，缩短收尾耗时
+    await asyncio.gather(
+        report.close(),
+        send_notifications(title, message),
+    )
 
 
 if __name__ == "__main__":
+    install_uvloop(logger)
     asyncio.run(main())
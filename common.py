@@ -3,66 +3,582 @@
 
 import asyncio
 import base64
+import functools
+import json
 import logging
 import os
+import random
+import re
+import shutil
+import sys
+import threading
 import time
 from datetime import timezone, timedelta
-from typing import Optional, Callable, Awaitable, Tuple
+from typing import Optional, Callable, Awaitable, Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
 
 # Use Beijing timezone
 BEIJING_TZ = timezone(timedelta(hours=8))
+BEIJING_OFFSET_SECONDS = 8 * 3600
+
+# Site selectors shared by the check-in and daily-report flows
+USERNAME_INPUT_SELECTOR = 'input[type="text"][placeholder="请输入用户名"]'
+PASSWORD_INPUT_SELECTOR = 'input[type="password"][placeholder="请输入密码"]'
+CAPTCHA_INPUT_SELECTOR = 'input[type="text"][placeholder="请输入验证码"]'
+CAPTCHA_IMG_SELECTOR = "div.captcha-image img"
+LOGIN_BUTTON_SELECTOR = 'button:has-text("登录"), .login-btn, .submit-btn'
+KNOW_BUTTON_SELECTOR = (
+    'button.van-button.van-button--default.van-button--large.van-dialog__confirm:has-text("我知道了")'
+)
+ACCOUNT_NAV_SELECTOR = 'span.nav-text:has-text("账号列表")'
+
+# Login toasts that no retry can fix (JS regex source)
+CREDENTIAL_ERROR_PATTERN = "密码错误|用户名或密码|账号不存在|用户不存在"
+
+# Outcome of a login submit: "redirect" once the URL leaves the login page, "bad_credentials"
+# when a credential error toast is visible, otherwise false so wait_for_function keeps polling.
+_LOGIN_OUTCOME_JS = """([loginUrl, pattern]) => {
+    if (location.href !== loginUrl) return 'redirect';
+    const re = new RegExp(pattern);
+    for (const toast of document.querySelectorAll('div.van-toast__text')) {
+        if (toast.getClientRects().length && re.test(toast.innerText)) return 'bad_credentials';
+    }
+    return false;
+}"""
+
+# Upper bound for one run_with_retries back-off wait, whatever the backoff factor
+MAX_RETRY_DELAY_SECONDS = 300
+
+
+class NonRetriableError(Exception):
+    """A failure that retrying cannot fix (e.g. rejected credentials); run_with_retries stops at once."""
+
+
+class _CachedTimeFormatter(logging.Formatter):
+    """Formatter that runs localtime/strftime for asctime at most once per second."""
+
+    def __init__(self, fmt: str):
+        super().__init__(fmt)
+        self._time_cache: Tuple[int, str] = (-1, "")
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        if datefmt:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        cached_second, prefix = self._time_cache
+        if second != cached_second:
+            prefix = time.strftime(self.default_time_format, self.converter(record.created))
+            self._time_cache = (second, prefix)
+        return self.default_msec_format % (prefix, record.msecs)
 
 
 def get_logger(name: str = __name__) -> logging.Logger:
-    """Initialize and return a logger."""
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        handlers=[logging.StreamHandler()],
-    )
+    """Return a logger, configuring the root handler only on first use."""
+    if not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(_CachedTimeFormatter("%(asctime)s - %(levelname)s - %(message)s"))
+        logging.basicConfig(level=logging.INFO, handlers=[handler])
     return logging.getLogger(name)
 
 
-async def solve_captcha(page, ocr, logger: logging.Logger, max_attempts: int = 3) -> str:
-    """Generic captcha solver: screenshot -> OCR -> keep 4 digits."""
+def now_beijing_str() -> str:
+    """Current Beijing time as "YYYY-mm-dd HH:MM:SS", without building datetime/tzinfo objects."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() + BEIJING_OFFSET_SECONDS))
+
+
+def install_uvloop(logger: logging.Logger) -> bool:
+    """Use uvloop's event loop for the next asyncio.run() when it is installed (POSIX only)."""
+    if sys.platform == "win32":
+        return False
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("using uvloop event loop")
+    return True
+
+
+def get_int_env(var_name: str, default: int, logger: logging.Logger) -> int:
+    """Read an int environment variable; fall back to default when invalid."""
+    try:
+        return int(os.getenv(var_name, str(default)))
+    except Exception:
+        logger.warning(f"invalid env {var_name}, using default {default}")
+        return default
+
+
+def get_float_env(var_name: str, default: float, logger: logging.Logger) -> float:
+    """Read a float environment variable; fall back to default when invalid."""
     try:
-        await page.wait_for_selector("div.captcha-image img", timeout=15000)
+        return float(os.getenv(var_name, str(default)))
+    except Exception:
+        logger.warning(f"invalid env {var_name}, using default {default}")
+        return default
+
+
+async def race_selectors(page, selectors: Dict[str, str], timeout: int) -> Optional[str]:
+    """Wait for whichever selector becomes visible first; return its key, or None on timeout.
+
+    Each selector is watched in-page by Playwright; the losing waits are cancelled.
+    """
+    return await race_waits(
+        {key: page.wait_for_selector(selector, state="visible", timeout=timeout) for key, selector in selectors.items()}
+    )
+
+
+async def race_waits(waits: Dict[str, Awaitable]) -> Optional[str]:
+    """Return the key of the first wait that succeeds, or None if all of them fail; the rest are cancelled."""
+    tasks = {asyncio.ensure_future(wait): key for key, wait in waits.items()}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.exception():
+                    return tasks[task]
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+# Headless Chromium flags: no GPU/extension/first-run work, /dev/shm is often tiny in containers.
+CHROMIUM_ARGS = [
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--no-first-run",
+    "--disable-background-networking",
+    "--disable-sync",
+    "--mute-audio",
+    "--disable-blink-features=AutomationControlled",
+]
+BROWSER_VIEWPORT = {"width": 1280, "height": 720}
+BROWSER_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+def get_browser_profile_dir() -> str:
+    """Persistent Chromium profile directory (BROWSER_PROFILE_DIR, default /tmp/pw_profile)."""
+    return os.getenv("BROWSER_PROFILE_DIR") or "/tmp/pw_profile"
+
+
+def reset_browser_profile(logger: logging.Logger) -> None:
+    """Delete the persistent profile so the next launch starts cold and logs in again."""
+    profile_dir = get_browser_profile_dir()
+    shutil.rmtree(profile_dir, ignore_errors=True)
+    logger.info(f"browser profile reset: {profile_dir}")
+
+
+async def launch_persistent_browser(playwright, headless: bool = True):
+    """Launch Chromium on the persistent profile so cookies and HTTP cache survive between runs.
+
+    No request routing is installed here: any Playwright route disables the HTTP cache, and
+    re-using cached JS/CSS bundles saves more than blocking images does.
+    """
+    context = await playwright.chromium.launch_persistent_context(
+        user_data_dir=get_browser_profile_dir(),
+        headless=headless,
+        args=CHROMIUM_ARGS,
+        viewport=BROWSER_VIEWPORT,
+        user_agent=BROWSER_USER_AGENT,
+    )
+    return context
+
+
+class BrowserPool:
+    """Reference-counted persistent browser shared by every flow in the process.
+
+    Chromium locks its profile directory, so two flows must not launch the same profile
+    side by side; they share one context instead, each on its own page. The browser is
+    closed when the last holder releases it, so a long-lived process (the scheduler) keeps
+    one reference of its own for sequential flows to reuse the browser.
+    """
+
+    def __init__(self):
+        self._playwright = None
+        self._context = None
+        self._refs = 0
+        self._lock = asyncio.Lock()
+
+    def _on_context_close(self, context) -> None:
+        # Chromium crashed or was closed underneath us: forget it so the next acquire relaunches
+        if context is self._context:
+            self._context = None
+
+    async def acquire(self, headless: bool = True):
+        """Return the shared BrowserContext, launching it on first use or after it died."""
+        async with self._lock:
+            if self._context is None and self._playwright is not None:
+                try:
+                    await self._playwright.stop()
+                except Exception:
+                    pass
+                self._playwright = None
+            if self._context is None:
+                from playwright.async_api import async_playwright
+
+                self._playwright = await async_playwright().start()
+                try:
+                    self._context = await launch_persistent_browser(self._playwright, headless=headless)
+                except Exception:
+                    await self._playwright.stop()
+                    self._playwright = None
+                    raise
+                self._context.on("close", self._on_context_close)
+            self._refs += 1
+            return self._context
+
+    async def release(self) -> None:
+        """Drop one reference; the last one closes the browser and Playwright."""
+        async with self._lock:
+            self._refs = max(0, self._refs - 1)
+            if self._refs or self._playwright is None:
+                return
+            await self._close()
+
+    async def shutdown(self) -> None:
+        """Close the browser regardless of outstanding holders (process shutdown)."""
+        async with self._lock:
+            self._refs = 0
+            if self._playwright is not None:
+                await self._close()
+
+    async def _close(self) -> None:
+        context, playwright = self._context, self._playwright
+        self._context = self._playwright = None
+        try:
+            if context is not None:
+                await context.close()
+        finally:
+            await playwright.stop()
+
+
+browser_pool = BrowserPool()
+
+
+# Resource types the bot never reads; the captcha image is always let through.
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+
+async def _route_block_heavy(route) -> None:
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES and "captcha" not in request.url.lower():
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def block_heavy_resources(target) -> None:
+    """Abort image/media/font requests on a Page or BrowserContext, except captcha images.
+
+    Routing turns off the browser HTTP cache for that target, so only use it on throwaway contexts.
+    """
+    await target.route("**/*", _route_block_heavy)
+
+
+# Only these request headers are written to the API record; custom auth/token headers never are.
+_RECORDED_HEADERS = frozenset(
+    {"accept", "accept-language", "content-type", "origin", "referer", "user-agent", "x-requested-with"}
+)
+
+
+def record_api_calls(page) -> Tuple[list, Callable[[], None]]:
+    """Collect XHR/fetch exchanges seen on page.
+
+    Request bodies may carry credentials or report text, so they are redacted to their size
+    unless API_RECORD_BODY=1. Returns the list that is filled in as responses arrive and a
+    callable that stops recording.
+    """
+    calls = []
+    keep_body = os.getenv("API_RECORD_BODY") == "1"
+
+    def _on_response(response) -> None:
+        request = response.request
+        if request.resource_type not in ("xhr", "fetch"):
+            return
+        post_data = request.post_data
+        if post_data is not None and not keep_body:
+            post_data = f"<redacted {len(post_data)} chars>"
+        calls.append({
+            "method": request.method,
+            "url": request.url,
+            "status": response.status,
+            "headers": {k: v for k, v in request.headers.items() if k.lower() in _RECORDED_HEADERS},
+            "post_data": post_data,
+        })
+
+    page.on("response", _on_response)
+    return calls, lambda: page.remove_listener("response", _on_response)
+
+
+def save_api_calls(calls: list, path: str, logger: logging.Logger) -> None:
+    """Write recorded API calls to path as JSON; failures are logged, never raised."""
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(calls, f, ensure_ascii=False, indent=2)
+        logger.info(f"recorded {len(calls)} API calls to {path}")
+    except OSError as e:
+        logger.warning(f"failed to save API record to {path}: {e}")
+
+
+async def wait_for_optional_selector(page, selector: str, timeout: int, state: str = "visible") -> bool:
+    """Wait until selector reaches state; return False on timeout instead of raising."""
+    try:
+        await page.wait_for_selector(selector, state=state, timeout=timeout)
+        return True
+    except Exception:
+        return False
+
+
+async def refresh_captcha(page, logger: logging.Logger, timeout: int = 5000) -> bool:
+    """Click the captcha image to regenerate it in place; True once a new image has loaded."""
+    try:
+        old_src = await page.get_attribute(CAPTCHA_IMG_SELECTOR, "src")
+        await page.click(CAPTCHA_IMG_SELECTOR, timeout=timeout)
+        await page.wait_for_function(
+            """([selector, oldSrc]) => {
+                const img = document.querySelector(selector);
+                return !!img && img.getAttribute("src") !== oldSrc && img.complete;
+            }""",
+            arg=[CAPTCHA_IMG_SELECTOR, old_src],
+            timeout=timeout,
+        )
+        return True
+    except Exception as e:
+        logger.warning(f"refresh captcha in place failed: {e}")
+        return False
+
+
+# 1x1 white PNG used to run one throwaway OCR inference before the real captcha
+_WARMUP_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAADElEQVR4nGP4//8/AAX+Av4N70a4AAAAAElFTkSuQmCC"
+)
+
+
+def _ocr_graph_path(ocr) -> Optional[str]:
+    """Model path of a ddddocr instance whose ONNX session can be replaced; None on unsupported versions."""
+    if not hasattr(ocr, "_DdddOcr__ort_session"):
+        return None
+    return getattr(ocr, "_DdddOcr__graph_path", None)
+
+
+def _load_ocr_session(ocr, model_path: str, logger: logging.Logger) -> None:
+    """Replace ddddocr's ONNX session with a CPU session for model_path.
+
+    OCR_THREADS sets the intra-op thread count; 0 (default) keeps onnxruntime's own choice.
+    """
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = max(0, get_int_env("OCR_THREADS", 0, logger))
+    ocr._DdddOcr__ort_session = onnxruntime.InferenceSession(
+        model_path, sess_options=options, providers=["CPUExecutionProvider"]
+    )
+
+
+def limit_ocr_threads(ocr, logger: logging.Logger) -> bool:
+    """Rebuild ddddocr's FP32 session with OCR_THREADS threads when that is set.
+
+    Costs a second model load, so it is opt-in; any failure keeps the session ddddocr built.
+    """
+    if not ocr or get_int_env("OCR_THREADS", 0, logger) <= 0:
+        return False
+    graph_path = _ocr_graph_path(ocr)
+    if not graph_path:
+        logger.warning("unsupported ddddocr version, ignore OCR_THREADS")
+        return False
+    try:
+        _load_ocr_session(ocr, graph_path, logger)
+        logger.info(f"OCR session limited to {os.getenv('OCR_THREADS')} threads")
+        return True
+    except Exception as e:
+        logger.warning(f"OCR thread limit setup failed, keep default session: {e}")
+    return False
+
+
+def enable_int8_ocr(ocr, logger: logging.Logger) -> bool:
+    """Swap ddddocr's FP32 session for a dynamically INT8-quantized copy when OCR_INT8=1.
+
+    Needs the optional ``onnx`` package; any failure keeps the original FP32 model.
+    """
+    if not ocr or os.getenv("OCR_INT8") != "1":
+        return False
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        graph_path = _ocr_graph_path(ocr)
+        if not graph_path:
+            logger.warning("unsupported ddddocr version, keep FP32 OCR model")
+            return False
+
+        # Key the cache on the source model's size and mtime so a ddddocr upgrade re-quantizes
+        cache_dir = os.getenv("OCR_INT8_CACHE_DIR") or "/tmp"
+        stat = os.stat(graph_path)
+        stem = os.path.splitext(os.path.basename(graph_path))[0]
+        int8_path = os.path.join(cache_dir, f"{stem}.{stat.st_size}-{stat.st_mtime_ns}.int8.onnx")
+        if not os.path.exists(int8_path):
+            # Quantize to a private temp file and rename it into place, so concurrent
+            # processes never load a half-written model
+            tmp_path = f"{int8_path}.{os.getpid()}.tmp.onnx"
+            try:
+                quantize_dynamic(graph_path, tmp_path, weight_type=QuantType.QInt8)
+                os.replace(tmp_path, int8_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            logger.info(f"OCR model quantized to {int8_path}")
+
+        _load_ocr_session(ocr, int8_path, logger)
+        logger.info("OCR using INT8 model")
+        return True
+    except ImportError as e:
+        logger.warning(f"INT8 OCR requires onnx/onnxruntime quantization support: {e}")
+    except Exception as e:
+        logger.warning(f"INT8 OCR setup failed, keep FP32 model: {e}")
+    return False
+
+
+_ocr = None
+_ocr_loaded = False
+_ocr_warmed = False
+_ocr_lock = threading.Lock()
+
+
+def get_ocr(logger: logging.Logger):
+    """Lazily create the shared ddddocr instance on first use; None if ddddocr is unavailable.
+
+    Loading the model is slow, so runs that exit early never pay for it. Thread-safe.
+    """
+    global _ocr, _ocr_loaded
+    with _ocr_lock:
+        if not _ocr_loaded:
+            _ocr_loaded = True
+            try:
+                import ddddocr
+
+                _ocr = ddddocr.DdddOcr(show_ad=False)
+                # The INT8 session already honours OCR_THREADS; only rebuild FP32 when it is not used
+                if not enable_int8_ocr(_ocr, logger):
+                    limit_ocr_threads(_ocr, logger)
+                logger.info("ddddocr loaded, captcha will be solved automatically")
+            except ImportError:
+                logger.warning("ddddocr not installed, captcha cannot be solved automatically")
+            except Exception as e:
+                logger.warning(f"ddddocr init failed: {e}")
+    return _ocr
+
+
+def _load_and_warm_ocr(logger: logging.Logger) -> bool:
+    """Run the dummy inference once per process; True only for the call that did it."""
+    global _ocr_warmed
+    ocr = get_ocr(logger)
+    with _ocr_lock:
+        if not ocr or _ocr_warmed:
+            return False
+        ocr.classification(_WARMUP_PNG)
+        _ocr_warmed = True
+    return True
+
+
+async def warm_up_ocr(logger: logging.Logger) -> None:
+    """Load the OCR model and run one dummy inference in a worker thread, overlapping browser startup.
+
+    Later calls in the same process (retries, scheduled runs) return without touching the model.
+    """
+    if _ocr_warmed:
+        return
+    start_ts = time.monotonic()
+    try:
+        if await asyncio.get_running_loop().run_in_executor(None, _load_and_warm_ocr, logger):
+            logger.info(f"OCR warmed up in {time.monotonic() - start_ts:.2f}s")
+    except Exception as e:
+        logger.warning(f"OCR warm-up failed: {e}")
+
+
+CAPTCHA_LENGTH = 4
+_NON_DIGITS = re.compile(r"\D+")
+
+# Base64 image bytes without a screenshot: the data: URL payload, or the already-decoded image
+# re-encoded through a canvas (no second request, which could issue a new captcha). "" when
+# neither works (e.g. a cross-origin image taints the canvas), null if the element is missing.
+_CAPTCHA_DATA_URL_JS = """(selector) => {
+    const img = document.querySelector(selector);
+    if (!img) return null;
+    const src = img.getAttribute('src') || '';
+    const comma = src.indexOf(';base64,');
+    if (src.startsWith('data:image') && !src.startsWith('data:image/svg') && comma >= 0) {
+        return src.slice(comma + 8);
+    }
+    if (!img.complete || !img.naturalWidth) return '';
+    try {
+        const canvas = document.createElement('canvas');
+        canvas.width = img.naturalWidth;
+        canvas.height = img.naturalHeight;
+        canvas.getContext('2d').drawImage(img, 0, 0);
+        return canvas.toDataURL('image/png').split(',', 2)[1] || '';
+    } catch (e) {
+        return '';
+    }
+}"""
+
+
+async def solve_captcha(page, logger: logging.Logger, max_attempts: int = 3) -> str:
+    """Generic captcha solver: data URL / canvas (or screenshot) -> OCR -> keep 4 digits."""
+    loop = asyncio.get_running_loop()
+    ocr = await loop.run_in_executor(None, get_ocr, logger)
+    try:
+        await page.wait_for_selector(CAPTCHA_IMG_SELECTOR, timeout=15000)
     except Exception:
         logger.error("captcha image not found")
         return ""
 
     for attempt in range(max_attempts):
-        captcha_img = await page.query_selector("div.captcha-image img")
-        if not captcha_img:
+        # One round trip for the image bytes; the element screenshot is only the fallback
+        b64_payload = await page.evaluate(_CAPTCHA_DATA_URL_JS, CAPTCHA_IMG_SELECTOR)
+        if b64_payload is None:
             logger.error("captcha image element missing")
             return ""
 
-        try:
-            img_data = await captcha_img.screenshot(type="png")
-        except Exception as e:
-            logger.warning(f"screenshot captcha failed, fallback base64: {e}")
-            src = await captcha_img.get_attribute("src")
-            if not src or not src.startswith("data:image"):
-                logger.error("captcha image format invalid")
+        if b64_payload:
+            img_data = base64.b64decode(b64_payload)
+        else:
+            try:
+                img_data = await page.locator(CAPTCHA_IMG_SELECTOR).first.screenshot(type="png")
+            except Exception as e:
+                logger.error(f"screenshot captcha failed: {e}")
                 return ""
-            base64_data = src.split(",")[1]
-            img_data = base64.b64decode(base64_data)
 
         if ocr:
-            raw_text = ocr.classification(img_data)
-            captcha_text = "".join(ch for ch in raw_text if ch.isdigit())
-            if len(captcha_text) == 4:
-                logger.info(f"captcha result: {captcha_text}")
-                return captcha_text
-
-            logger.warning(
-                f"captcha invalid. raw: {raw_text}, filtered: {captcha_text}, refreshing (attempt {attempt + 1})"
+            # ONNX inference is CPU-bound; run it off-loop, and decode the image both as-is and with
+            # ddddocr's transparent-PNG fix in parallel so one readable variant avoids a refresh.
+            candidates = await asyncio.gather(
+                loop.run_in_executor(None, ocr.classification, img_data),
+                loop.run_in_executor(None, functools.partial(ocr.classification, img_data, png_fix=True)),
+                return_exceptions=True,
             )
-            try:
-                await captcha_img.click()
-                await asyncio.sleep(0.6)
-            except Exception as e:
-                logger.warning(f"refresh captcha failed: {e}")
+            raw_texts = [text for text in candidates if isinstance(text, str)]
+            for raw_text in raw_texts:
+                # Extra characters mean OCR misread something; submitting the remaining digits would
+                # just fail the login (~10s), whereas an in-place refresh costs a fraction of a second.
+                if len(raw_text.strip()) != CAPTCHA_LENGTH:
+                    continue
+                captcha_text = _NON_DIGITS.sub("", raw_text)
+                if len(captcha_text) == CAPTCHA_LENGTH:
+                    logger.info(f"captcha result: {captcha_text}")
+                    return captcha_text
+
+            logger.warning(f"captcha invalid. raw: {raw_texts}, refreshing (attempt {attempt + 1})")
+            await refresh_captcha(page, logger)
         else:
             logger.warning("OCR unavailable, cannot solve captcha automatically")
             return ""
@@ -71,59 +587,119 @@ async def solve_captcha(page, ocr, logger: logging.Logger, max_attempts: int = 3
     return ""
 
 
+_FILL_INPUTS_JS = """(values) => {
+    const setValue = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+    const missing = [];
+    for (const [selector, value] of Object.entries(values)) {
+        const el = document.querySelector(selector);
+        if (!el) { missing.push(selector); continue; }
+        setValue.call(el, value);
+        el.dispatchEvent(new Event('input', { bubbles: true }));
+        el.dispatchEvent(new Event('change', { bubbles: true }));
+    }
+    return missing;
+}"""
+
+
+async def fill_inputs(page, values: Dict[str, str]) -> None:
+    """Fill several inputs in one page round trip, firing input/change events like typing would."""
+    missing = await page.evaluate(_FILL_INPUTS_JS, values)
+    if missing:
+        raise RuntimeError(f"inputs not found: {', '.join(missing)}")
+
+
 async def login_with_retry(
     page,
     username: str,
     password: str,
     login_url: str,
-    ocr,
     logger: logging.Logger,
     max_attempts: int = 10,
     total_timeout: int = 300,
+    max_captcha_refreshes: int = 3,
 ) -> bool:
-    """Generic login with total timeout and retries."""
+    """Generic login with total timeout and retries.
+
+    An unreadable captcha is refreshed in place; the page is only reloaded after
+    max_captcha_refreshes consecutive misses.
+    """
     start_ts = time.monotonic()
     attempt = 0
+    captcha_misses = 0
+
+    # Locators are lazy handles: build them once and reuse them on every retry
+    username_input = page.locator(USERNAME_INPUT_SELECTOR)
+    login_button = page.locator(LOGIN_BUTTON_SELECTOR).first
+    know_button = page.locator(KNOW_BUTTON_SELECTOR).first
 
     try:
-        await page.goto(login_url, wait_until="networkidle", timeout=60000)
-        await asyncio.sleep(2)
+        await page.goto(login_url, wait_until="domcontentloaded", timeout=30000)
+        # The SPA may redirect after domcontentloaded, so race the login form against a URL change
+        opened = await race_waits(
+            {
+                "form": username_input.wait_for(timeout=15000),
+                "redirect": page.wait_for_url(
+                    lambda url: url != login_url, wait_until="domcontentloaded", timeout=15000
+                ),
+            }
+        )
     except Exception as e:
         logger.error(f"open login page failed: {e}")
         return False
+    if opened == "redirect":
+        # Session cookies from the persistent profile are still valid
+        logger.info(f"already logged in, current page: {page.url}")
+        return True
+    if opened is None:
+        logger.error("open login page failed: login form did not appear")
+        return False
 
     while attempt < max_attempts and (time.monotonic() - start_ts) < total_timeout:
         attempt += 1
         logger.info(f"login attempt {attempt}/{max_attempts}")
         try:
-            await page.wait_for_selector('input[type="text"][placeholder="请输入用户名"]', timeout=30000)
-            await page.fill('input[type="text"][placeholder="请输入用户名"]', username)
-            await page.fill('input[type="password"][placeholder="请输入密码"]', password)
+            await username_input.wait_for(timeout=30000)
 
-            captcha_text = await solve_captcha(page, ocr, logger)
+            # Credentials do not depend on the captcha: type them while OCR runs
+            captcha_task = asyncio.ensure_future(solve_captcha(page, logger))
+            try:
+                await fill_inputs(page, {USERNAME_INPUT_SELECTOR: username, PASSWORD_INPUT_SELECTOR: password})
+            except BaseException:
+                # Do not leave the OCR task running into the next attempt's page reload
+                captcha_task.cancel()
+                await asyncio.gather(captcha_task, return_exceptions=True)
+                raise
+            captcha_text = await captcha_task
             if not captcha_text:
-                await page.reload(wait_until="networkidle", timeout=60000)
-                await asyncio.sleep(2)
+                captcha_misses += 1
+                if captcha_misses >= max_captcha_refreshes or not await refresh_captcha(page, logger):
+                    captcha_misses = 0
+                    # Readiness is checked by the form and captcha-image waits at the top of the loop
+                    await page.reload(wait_until="domcontentloaded", timeout=30000)
                 continue
+            captcha_misses = 0
 
-            await page.fill('input[type="text"][placeholder="请输入验证码"]', captcha_text)
+            await fill_inputs(page, {CAPTCHA_INPUT_SELECTOR: captcha_text})
 
-            login_button = await page.query_selector('button:has-text("登录"), .login-btn, .submit-btn')
-            if login_button:
+            if await login_button.count():
                 await login_button.click()
             else:
-                await page.press('input[type="text"][placeholder="请输入验证码"]', "Enter")
-
-            await asyncio.sleep(3)
+                await page.press(CAPTCHA_INPUT_SELECTOR, "Enter")
 
             try:
-                know_button = await page.wait_for_selector(
-                    'button.van-button.van-button--default.van-button--large.van-dialog__confirm:has-text("我知道了")',
-                    timeout=5000,
+                handle = await page.wait_for_function(
+                    _LOGIN_OUTCOME_JS, arg=[login_url, CREDENTIAL_ERROR_PATTERN], timeout=10000, polling=100
                 )
-                if know_button:
-                    await know_button.click()
-                    await asyncio.sleep(1)
+                if await handle.json_value() == "bad_credentials":
+                    raise NonRetriableError("login rejected: invalid username or password")
+            except NonRetriableError:
+                raise
+            except Exception:
+                pass
+
+            try:
+                await know_button.click(timeout=5000)
+                await know_button.wait_for(state="hidden", timeout=3000)
             except Exception:
                 pass
 
@@ -131,16 +707,41 @@ async def login_with_retry(
                 logger.info(f"login success, current page: {page.url}")
                 return True
 
+            # No fixed pause: the form and captcha waits at the top of the loop gate the retry
             logger.warning("login may have failed, retrying...")
-            await asyncio.sleep(2)
+        except NonRetriableError:
+            raise
         except Exception as e:
             logger.error(f"login flow error: {e}")
-            await asyncio.sleep(2)
 
     logger.error("login timeout or retries exceeded")
     return False
 
 
+_http_session: Optional[requests.Session] = None
+
+
+def get_http_session() -> requests.Session:
+    """Process-wide requests.Session with a small keep-alive pool for notifications.
+
+    Shared by every job in the scheduler process, so retries and later runs reuse the TLS connection.
+    """
+    global _http_session
+    if _http_session is None:
+        session = requests.Session()
+        session.headers["Content-Type"] = "application/json"
+        # One pool per push host; retries are done by the senders' own loops, not nested inside urllib3
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=2, max_retries=0)
+        session.mount("https://", adapter)
+        _http_session = session
+    return _http_session
+
+
+def _notify_backoff(attempt: int) -> float:
+    """Jittered exponential delay before notification retry attempt + 1, capped at 30s."""
+    return min(30.0, 2 ** attempt + random.random())
+
+
 async def send_wxpush(
     title: str,
     message: str,
@@ -149,7 +750,10 @@ async def send_wxpush(
     max_retries: int = 3,
     timeout: int = 10,
 ) -> None:
-    """WXPush (Cloudflare Worker) notification. Skips if not configured."""
+    """WXPush (Cloudflare Worker) notification. Skips if not configured.
+
+    The blocking POST runs in a worker thread so it can overlap other awaits.
+    """
     base_url = (os.getenv("WXPUSH_URL") or "").rstrip("/")
     token = os.getenv("WXPUSH_TOKEN") or ""
     userid = os.getenv("WXPUSH_USERID") or ""
@@ -167,7 +771,7 @@ async def send_wxpush(
 
     for attempt in range(1, max_retries + 1):
         try:
-            resp = request_client.post(url, json=payload, headers=headers, timeout=timeout)
+            resp = await asyncio.to_thread(request_client.post, url, json=payload, headers=headers, timeout=timeout)
             text = resp.text
             if resp.ok:
                 logger.info(f"WXPush sent: {resp.status_code} {text}")
@@ -175,11 +779,20 @@ async def send_wxpush(
             logger.warning(f"WXPush failed (attempt {attempt}): {resp.status_code} {text}")
         except Exception as e:
             logger.warning(f"WXPush error (attempt {attempt}): {e}")
-        await asyncio.sleep(2 * attempt)
+        if attempt < max_retries:
+            await asyncio.sleep(_notify_backoff(attempt))
 
     logger.error("WXPush failed after retries")
 
 
+# Fixed WxPusher message shape; only the string fields are JSON-encoded per call
+_WXPUSHER_BODY_TEMPLATE = (
+    '{{"appToken":{app_token},"content":{content},"summary":{summary},'
+    '"contentType":3,"uids":[{uid}],"verifyPay":false}}'
+)
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
 async def send_wxpusher(
     app_token: str,
     uid: str,
@@ -190,24 +803,24 @@ async def send_wxpusher(
     max_retries: int = 3,
     timeout: int = 10,
 ) -> None:
-    """WxPusher notification with retries. request_client must be requests-compatible."""
+    """WxPusher notification with retries. request_client must be requests-compatible (called off-loop)."""
     if not app_token or not uid:
         logger.warning("WxPusher not configured, skip")
         return
 
     url = "https://wxpusher.zjiecode.com/api/send/message"
-    data = {
-        "appToken": app_token,
-        "content": f"# {title}\n\n{message}",
-        "summary": title,
-        "contentType": 3,
-        "uids": [uid],
-        "verifyPay": False,
-    }
+    body = _WXPUSHER_BODY_TEMPLATE.format(
+        app_token=json.dumps(app_token),
+        content=json.dumps(f"# {title}\n\n{message}"),
+        summary=json.dumps(title),
+        uid=json.dumps(uid),
+    ).encode("utf-8")
 
     for attempt in range(1, max_retries + 1):
         try:
-            resp = request_client.post(url, json=data, timeout=timeout)
+            resp = await asyncio.to_thread(
+                request_client.post, url, data=body, headers=_JSON_HEADERS, timeout=timeout
+            )
             result = resp.json()
             if result.get("code") == 1000:
                 logger.info("WxPusher sent")
@@ -215,7 +828,8 @@ async def send_wxpusher(
             logger.warning(f"WxPusher failed (attempt {attempt}): {result.get('msg')}")
         except Exception as e:
             logger.warning(f"WxPusher error (attempt {attempt}): {e}")
-        await asyncio.sleep(2 * attempt)
+        if attempt < max_retries:
+            await asyncio.sleep(_notify_backoff(attempt))
 
     logger.error("WxPusher failed after retries")
 
@@ -228,12 +842,18 @@ async def run_with_retries(
     delay_seconds: int = 60,
     backoff_factor: float = 1.0,
 ) -> Tuple[bool, int]:
-    """Generic retry wrapper; returns success flag and attempts used."""
+    """Generic retry wrapper; returns success flag and attempts used.
+
+    A NonRetriableError ends the loop immediately; each back-off wait is capped at MAX_RETRY_DELAY_SECONDS.
+    """
     attempts = max(1, max_attempts)
     for attempt in range(1, attempts + 1):
         start_ts = time.monotonic()
         try:
             success = await task_coro_factory()
+        except NonRetriableError as exc:
+            logger.error(f"{action_name} attempt {attempt} failed permanently, stop retrying: {exc}")
+            return False, attempt
         except Exception as exc:
             logger.error(f"{action_name} attempt {attempt} raised: {exc}")
             success = False
@@ -247,7 +867,7 @@ async def run_with_retries(
         if attempt >= attempts:
             break
 
-        wait_seconds = max(1, int(delay_seconds * (backoff_factor ** (attempt - 1))))
+        wait_seconds = max(1, min(MAX_RETRY_DELAY_SECONDS, int(delay_seconds * (backoff_factor ** (attempt - 1)))))
         logger.warning(f"{action_name} attempt {attempt}/{attempts} failed, retry in {wait_seconds}s")
         await asyncio.sleep(wait_seconds)
 
@@ -5,96 +5,221 @@
 """
 
 import asyncio
-import logging
-from datetime import datetime
-import schedule
-
-from common import BEIJING_TZ, get_logger
+import contextvars
+import functools
+import json
+import os
+import signal
+import time
+from typing import Optional
+
+from auto_checkin import main as checkin_main
+from auto_daily_report import main as daily_report_main
+from common import browser_pool, get_logger, install_uvloop, now_beijing_str
 
 logger = get_logger(__name__)
-job_lock = asyncio.Lock()
+
+# 正在执行的任务名；单线程事件循环中检查与赋值之间不会被打断，无需锁
+_running_job: Optional[str] = None
+
+DAY_SECONDS = 86400
+CLOCK_CHECK_INTERVAL = 6 * 3600
+MAX_CLOCK_DRIFT = 300
+
+# 预先拼好的多行横幅，每次只产生一条日志记录
+_SEP = "=" * 50
+_STARTUP_BANNER = f"\n{_SEP}\n打卡定时调度器启动\n{_SEP}"
+_CHECKIN_BANNER = f"\n{_SEP}\n定时任务触发：开始执行打卡脚本\n{_SEP}"
+_DAILY_REPORT_BANNER = f"\n{_SEP}\n定时任务触发：开始执行日报脚本\n{_SEP}"
 
 
 async def run_guarded(name: str, coro_func):
-    """带互斥锁的任务执行，避免并发重叠。"""
-    if job_lock.locked():
-        logger.warning(f"任务 {name} 正在执行，跳过本次触发")
+    """互斥执行任务：已有任务在执行时跳过本次触发，避免并发重叠。"""
+    global _running_job
+    if _running_job is not None:
+        logger.warning("任务 %s 正在执行，跳过本次 %s 触发", _running_job, name)
         return
 
-    async with job_lock:
-        logger.info(f"任务 {name} 开始执行")
-        try:
-            await coro_func()
-        except Exception as e:
-            logger.error(f"任务 {name} 执行失败: {e}")
-        finally:
-            logger.info(f"任务 {name} 结束")
+    _running_job = name
+    logger.info("任务 %s 开始执行", name)
+    ok = False
+    try:
+        await coro_func()
+        ok = True
+    except Exception:
+        # 带完整堆栈，便于排查定时任务失败原因；取消（CancelledError）不在此处吞掉
+        logger.exception("任务 %s 执行失败", name)
+    finally:
+        _running_job = None
+    logger.info("任务 %s 结束（%s）", name, "成功" if ok else "失败")
 
 
-async def run_checkin():
-    """运行打卡脚本"""
-    logger.info("=" * 50)
-    logger.info("定时任务触发：开始执行打卡脚本")
-    logger.info("=" * 50)
+# 可调度的脚本：脚本名 -> (触发横幅, 入口协程)
+SCRIPTS = {
+    "checkin": (_CHECKIN_BANNER, checkin_main),
+    "daily_report": (_DAILY_REPORT_BANNER, daily_report_main),
+}
 
-    from auto_checkin import main
 
-    await main()
+async def run_job(script: str):
+    """运行指定脚本的 main()"""
+    banner, script_main = SCRIPTS[script]
+    logger.info(banner)
+    await script_main()
 
 
-async def run_daily_report():
-    """运行日报脚本"""
-    logger.info("=" * 50)
-    logger.info("定时任务触发：开始执行日报脚本")
-    logger.info("=" * 50)
+# (任务名, 说明, 执行函数, UTC 时, UTC 分)；默认时间，可被 SCHEDULE_FILE 覆盖
+JOBS = (
+    ("checkin_am", "上班打卡", functools.partial(run_job, "checkin"), 23, 0),  # 北京时间 07:00
+    ("checkin_pm", "下班打卡", functools.partial(run_job, "checkin"), 9, 0),  # 北京时间 17:00
+    ("daily_report", "日报提交", functools.partial(run_job, "daily_report"), 9, 40),  # 北京时间 17:40
+)
 
-    from auto_daily_report import main
 
-    await main()
+# 已排定的定时器（任务名 -> TimerHandle）与执行中的任务（保留引用，防止被回收）
+_timers = {}
+_running_tasks = set()
+_clock_watchdog: Optional[asyncio.TimerHandle] = None
+
+
+def seconds_until_utc(hour: int, minute: int) -> float:
+    """距离下一次 UTC hour:minute 的秒数；Unix 时间每天恰好 86400 秒，取模即可。"""
+    remaining = (hour * 3600 + minute * 60 - time.time()) % DAY_SECONDS
+    return remaining or DAY_SECONDS
+
+
+def _fire(name: str, coro_func) -> None:
+    """定时器回调：排定 24 小时后的下一次触发，并启动本次任务。"""
+    loop = asyncio.get_running_loop()
+    _timers[name] = loop.call_later(DAY_SECONDS, _fire, name, coro_func)
+    coro = run_guarded(name, coro_func)
+    try:
+        # 任务不读取任何 contextvars，给一个空上下文，免去复制当前上下文
+        task = loop.create_task(coro, context=contextvars.Context())
+    except TypeError:
+        task = loop.create_task(coro)  # Python < 3.11 或事件循环不支持 context 参数
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+
+
+def load_schedule_overrides() -> dict:
+    """读取 SCHEDULE_FILE（JSON，任务名 -> 北京时间 "HH:MM"），返回 任务名 -> (UTC 时, UTC 分)。
+
+    每次排定时重新读取，修改文件后发送 SIGHUP 即可生效；文件缺失或无效时使用默认时间。
+    """
+    path = os.getenv("SCHEDULE_FILE", "")
+    if not path:
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        if not isinstance(entries, dict):
+            raise ValueError("顶层应为对象")
+    except (OSError, ValueError) as e:
+        logger.warning("读取调度配置 %s 失败，使用默认时间: %s", path, e)
+        return {}
+
+    overrides = {}
+    job_names = {job[0] for job in JOBS}
+    for name, value in entries.items():
+        if name not in job_names:
+            logger.warning("调度配置中的任务 %s 不存在，已忽略", name)
+            continue
+        try:
+            hour, minute = (int(part) for part in str(value).split(":"))
+            if not (0 <= hour < 24 and 0 <= minute < 60):
+                raise ValueError
+        except ValueError:
+            logger.warning("调度配置中 %s 的时间 %r 无效，使用默认时间", name, value)
+            continue
+        overrides[name] = ((hour - 8) % 24, minute)  # 北京时间 -> UTC
+    return overrides
 
 
 def schedule_jobs(loop: asyncio.AbstractEventLoop):
-    """配置定时任务"""
-    # 北京时间 07:00 = UTC 23:00 (前一天)
-    schedule.every().day.at("23:00").do(
-        lambda: loop.call_soon_threadsafe(asyncio.create_task, run_guarded("checkin_am", run_checkin))
-    )
-    logger.info("已配置上班打卡：北京时间每日 07:00 (UTC 23:00)")
-
-    # 北京时间 17:00 = UTC 09:00
-    schedule.every().day.at("09:00").do(
-        lambda: loop.call_soon_threadsafe(asyncio.create_task, run_guarded("checkin_pm", run_checkin))
-    )
-    logger.info("已配置下班打卡：北京时间每日 17:00 (UTC 09:00)")
-
-    # 北京时间 17:40 = UTC 09:40
-    schedule.every().day.at("09:40").do(
-        lambda: loop.call_soon_threadsafe(asyncio.create_task, run_guarded("daily_report", run_daily_report))
-    )
-    logger.info("已配置日报提交：北京时间每日 17:40 (UTC 09:40)")
+    """配置定时任务：每个任务一个事件循环定时器，到点前不产生任何唤醒。"""
+    overrides = load_schedule_overrides()
+    for name, label, coro_func, hour, minute in JOBS:
+        hour, minute = overrides.get(name, (hour, minute))
+        _timers[name] = loop.call_later(seconds_until_utc(hour, minute), _fire, name, coro_func)
+        logger.info(
+            "已配置%s：北京时间每日 %02d:%02d (UTC %02d:%02d)", label, (hour + 8) % 24, minute, hour, minute
+        )
+
+
+def cancel_jobs() -> None:
+    """取消所有已排定的定时器（不影响执行中的任务）。"""
+    for handle in _timers.values():
+        handle.cancel()
+    _timers.clear()
+
+
+def reschedule_jobs(loop: asyncio.AbstractEventLoop) -> None:
+    """重新读取调度配置并按当前时钟排定全部定时任务，无需重启进程（SIGHUP 触发）。"""
+    logger.info("重新排定定时任务")
+    cancel_jobs()
+    schedule_jobs(loop)
+
+
+def _check_clock(loop: asyncio.AbstractEventLoop, wall_start: float, mono_start: float) -> None:
+    """定时器按单调时钟计时；墙上时钟跳变（休眠唤醒、校时）超过阈值时按新时钟重新排定，错过的触发直接跳过。"""
+    global _clock_watchdog
+    drift = (time.time() - wall_start) - (loop.time() - mono_start)
+    if abs(drift) > MAX_CLOCK_DRIFT:
+        logger.warning("检测到系统时钟偏移 %.0f 秒，重新排定定时任务", drift)
+        reschedule_jobs(loop)
+    _clock_watchdog = loop.call_later(CLOCK_CHECK_INTERVAL, _check_clock, loop, time.time(), loop.time())
 
 
 async def main():
     """主函数：启动调度器"""
-    logger.info("=" * 50)
-    logger.info("打卡定时调度器启动")
-    logger.info("=" * 50)
+    logger.info(_STARTUP_BANNER)
 
     loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass  # Windows 不支持，仍由 KeyboardInterrupt 退出
+    if hasattr(signal, "SIGHUP"):
+        loop.add_signal_handler(signal.SIGHUP, reschedule_jobs, loop)
+
+    # 调度器自身持有一份共享浏览器引用，各任务结束释放时不会关闭浏览器，后续任务直接复用；
+    # 启动失败不影响调度，任务触发时会再次尝试启动
+    try:
+        await browser_pool.acquire()
+    except Exception as e:
+        logger.warning("预启动浏览器失败，将在任务触发时重试: %s", e)
+
     schedule_jobs(loop)
+    _check_clock(loop, time.time(), loop.time())
 
-    now_beijing = datetime.now(BEIJING_TZ)
-    logger.info(f"当前时间: {now_beijing.strftime('%Y-%m-%d %H:%M:%S')} (北京时间)")
+    logger.info("当前时间: %s (北京时间)", now_beijing_str())
     logger.info("定时调度器已启动，等待任务触发...")
-    logger.info("=" * 50)
-
+    logger.info(_SEP)
+
+    # 任务由定时器触发，这里只等待停止信号
+    await stop_event.wait()
+
+    cancel_jobs()
+    if _clock_watchdog:
+        _clock_watchdog.cancel()
+
+    # 取消执行中的任务并等待其退出，再关闭共享浏览器，不留下悬空任务与 Chromium 进程
+    if _running_tasks:
+        logger.info("正在取消执行中的任务...")
+        tasks = list(_running_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
     try:
-        while True:
-            schedule.run_pending()
-            await asyncio.sleep(30)  # 每 30 秒检查一次待执行任务
-    except KeyboardInterrupt:
-        logger.info("定时调度器已停止")
+        await browser_pool.shutdown()
+    except Exception as e:
+        logger.warning("关闭浏览器时出错: %s", e)
+    logger.info("定时调度器已停止")
 
 
 if __name__ == "__main__":
+    install_uvloop(logger)
     asyncio.run(main())